@@ -2,9 +2,20 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 from .. import models, schemas, database, engine
+from ..compiler import compile_cached, WorkflowValidationError
 
 router = APIRouter()
 
+def compile_for_save(db_workflow: models.Workflow) -> models.Workflow:
+    # Drafts may be saved in any state: compile now so runs hit the cache, and
+    # report problems instead of rejecting the save
+    try:
+        compile_cached(db_workflow.data)
+        db_workflow.validation_errors = []
+    except WorkflowValidationError as e:
+        db_workflow.validation_errors = e.errors
+    return db_workflow
+
 @router.post("/workflows/", response_model=schemas.Workflow)
 def create_workflow(workflow: schemas.WorkflowCreate, db: Session = Depends(database.get_db)):
     db_workflow = models.Workflow(
@@ -15,7 +26,7 @@ def create_workflow(workflow: schemas.WorkflowCreate, db: Session = Depends(data
     db.add(db_workflow)
     db.commit()
     db.refresh(db_workflow)
-    return db_workflow
+    return compile_for_save(db_workflow)
 
 @router.get("/workflows/", response_model=List[schemas.Workflow])
 def read_workflows(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
@@ -40,7 +51,7 @@ def update_workflow(workflow_id: int, workflow: schemas.WorkflowCreate, db: Sess
     db_workflow.data = workflow.data
     db.commit()
     db.refresh(db_workflow)
-    return db_workflow
+    return compile_for_save(db_workflow)
 
 @router.post("/run/{workflow_id}")
 async def run_workflow_endpoint(workflow_id: int, request: schemas.WorkflowRunRequest, db: Session = Depends(database.get_db)):
@@ -48,8 +59,14 @@ async def run_workflow_endpoint(workflow_id: int, request: schemas.WorkflowRunRe
     if db_workflow is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
+    # Reject invalid graphs before any node runs
+    try:
+        compiled = compile_cached(db_workflow.data)
+    except WorkflowValidationError as e:
+        raise HTTPException(status_code=400, detail={"message": "Invalid workflow", "errors": e.errors})
+
     try:
-        results = await engine.run_workflow(db_workflow.data, request.inputs)
+        results = await engine.run_workflow(db_workflow.data, request.inputs, compiled=compiled)
         return {"status": "success", "results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
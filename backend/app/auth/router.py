@@ -1,35 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from typing import Annotated
+import time
 
 from .. import models, schemas, database
-from . import security
+from . import security, cache
 
 router = APIRouter(tags=["Authentication"])
 get_db = database.get_db
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+def _get_user_by_email(db: Session, email: str):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def _create_user(db: Session, email: str, hashed_password: str):
+    new_user = models.User(email=email, hashed_password=hashed_password)
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+def _load_user_snapshot(email: str):
+    # Own short-lived session: the auth dependency shouldn't need a request-scoped one
+    db = database.SessionLocal()
+    try:
+        user = _get_user_by_email(db, email)
+        return schemas.User.model_validate(user) if user else None
+    finally:
+        db.close()
+
 @router.post("/auth/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check if user exists
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await run_in_threadpool(_get_user_by_email, db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
-    hashed_password = security.get_password_hash(user.password)
-    new_user = models.User(email=user.email, hashed_password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    hashed_password = await security.get_password_hash_async(user.password)
+    new_user = await run_in_threadpool(_create_user, db, user.email, hashed_password)
     return new_user
 
 @router.post("/auth/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_get_user_by_email, db, form_data.username)
+    if not user or not await security.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -39,23 +57,34 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     access_token = security.create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = security.jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+
+    # Verified claims and user rows are cached briefly so authenticated requests
+    # don't pay a JWT decode and a DB round-trip every time
+    email = cache.token_cache.get(token)
+    if email is None:
+        try:
+            payload = security.jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except security.jwt.JWTError:
             raise credentials_exception
-    except security.jwt.JWTError:
-        raise credentials_exception
-        
-    user = db.query(models.User).filter(models.User.email == email).first()
+        # Never cache a token past its own expiry
+        exp = payload.get("exp")
+        cache.token_cache.set(token, email, ttl=exp - time.time() if exp else None)
+
+    user = cache.user_cache.get(email)
     if user is None:
-        raise credentials_exception
+        user = await run_in_threadpool(_load_user_snapshot, email)
+        if user is None:
+            raise credentials_exception
+        cache.user_cache.set(email, user)
     return user
 
 @router.get("/auth/me", response_model=schemas.User)
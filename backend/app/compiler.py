@@ -0,0 +1,219 @@
+from typing import Dict, Any, List, Optional, Set
+from collections import OrderedDict, deque
+from string import Formatter
+from functools import lru_cache
+import hashlib
+import json
+import os
+import threading
+
+# Input/output handles per node type. None means any handle name is accepted
+# (prompt templates take one input per template variable).
+NODE_SPECS: Dict[str, Dict[str, Optional[Set[str]]]] = {
+    "inputNode": {"inputs": set(), "outputs": {"value", "output"}},
+    "promptNode": {"inputs": None, "outputs": {"output"}},
+    "llmNode": {"inputs": {"prompt", "context"}, "outputs": {"output"}},
+    "ragNode": {"inputs": {"query"}, "outputs": {"context", "output"}},
+    "outputNode": {"inputs": {"input"}, "outputs": {"output"}},
+    "mapNode": {"inputs": {"items", "input"}, "outputs": {"output", "results", "items", "count"}},
+    "reduceNode": {"inputs": {"items", "input"}, "outputs": {"output"}},
+}
+
+COMPILE_CACHE_SIZE = 256
+
+_formatter = Formatter()
+
+class WorkflowValidationError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__("Invalid workflow: " + "; ".join(errors))
+        self.errors = errors
+
+class PromptTemplate:
+    """
+    A promptNode template parsed once into literal text and fields.
+    `variables` are the names the template needs; render() fills them in without
+    re-parsing. Templates using format specs, conversions or attribute/index
+    access fall back to str.format_map.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self.parts = []
+        self.variables: Set[str] = set()
+        self.simple = True
+        # Raises ValueError on unbalanced braces
+        for literal, field, spec, conversion in _formatter.parse(template):
+            if field is not None:
+                if field == "" or field.isdigit():
+                    raise ValueError("positional fields like {} or {0} are not supported, name the variable")
+                name = field.split(".", 1)[0].split("[", 1)[0]
+                self.variables.add(name)
+                if spec or conversion or name != field:
+                    self.simple = False
+            self.parts.append((literal, field))
+
+    def render(self, values: Dict[str, Any]) -> str:
+        if not self.simple:
+            return self.template.format_map(values)
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is not None:
+                value = values[field]
+                out.append(value if isinstance(value, str) else format(value))
+        return "".join(out)
+
+@lru_cache(maxsize=1024)
+def get_template(template: str) -> PromptTemplate:
+    """
+    Parsed templates are shared by template text, so the engine reuses the work
+    done at save time.
+    """
+    return PromptTemplate(template)
+
+class CompiledWorkflow:
+    """
+    A validated workflow graph: node lookup, incoming edges, a topological
+    execution order and pre-parsed prompt templates.
+    """
+
+    def __init__(self, node_map, incoming, execution_order, templates):
+        self.node_map: Dict[str, Dict[str, Any]] = node_map
+        self.incoming: Dict[str, List[Dict[str, Any]]] = incoming
+        self.execution_order: List[str] = execution_order
+        self.templates: Dict[str, PromptTemplate] = templates
+
+def compile_workflow(workflow_data: Dict[str, Any]) -> CompiledWorkflow:
+    """
+    Validates node types, handles, edges, templates and cycles, collecting every
+    problem before raising WorkflowValidationError.
+    """
+    errors: List[str] = []
+    nodes = workflow_data.get("nodes", [])
+    edges = workflow_data.get("edges", [])
+
+    node_map = {}
+    for node in nodes:
+        node_id = node.get("id")
+        node_type = node.get("type")
+        if node_id is None:
+            errors.append("Node without an id")
+            continue
+        if node_id in node_map:
+            errors.append(f"Duplicate node id '{node_id}'")
+            continue
+        if node_type not in NODE_SPECS:
+            errors.append(f"Node '{node_id}' has unknown type '{node_type}'")
+        node_map[node_id] = node
+
+    incoming = {node_id: [] for node_id in node_map}
+    adj = {node_id: [] for node_id in node_map}
+    in_degree = {node_id: 0 for node_id in node_map}
+
+    for edge in edges:
+        source, target = edge.get("source"), edge.get("target")
+        if source not in node_map or target not in node_map:
+            errors.append(f"Edge {source} -> {target} references a node that does not exist")
+            continue
+        source_spec = NODE_SPECS.get(node_map[source]["type"])
+        target_spec = NODE_SPECS.get(node_map[target]["type"])
+        source_handle = edge.get("sourceHandle")
+        target_handle = edge.get("targetHandle")
+        if source_spec and source_handle is not None and source_handle not in source_spec["outputs"]:
+            errors.append(f"Edge {source} -> {target} uses unknown output handle '{source_handle}' of {node_map[source]['type']}")
+        if target_spec:
+            allowed = target_spec["inputs"]
+            if target_handle is None or (allowed is not None and target_handle not in allowed):
+                errors.append(f"Edge {source} -> {target} uses unknown input handle '{target_handle}' of {node_map[target]['type']}")
+        adj[source].append(target)
+        in_degree[target] += 1
+        incoming[target].append(edge)
+
+    # Topological sort (BFS)
+    queue = deque(node_id for node_id, deg in in_degree.items() if deg == 0)
+    execution_order = []
+    while queue:
+        u = queue.popleft()
+        execution_order.append(u)
+        for v in adj[u]:
+            in_degree[v] -= 1
+            if in_degree[v] == 0:
+                queue.append(v)
+    if len(execution_order) != len(node_map):
+        errors.append("Cycle detected in workflow")
+
+    templates = {}
+    for node_id, node in node_map.items():
+        data = node.get("data") or {}
+        if node.get("type") == "promptNode":
+            try:
+                template = get_template(data.get("template", ""))
+            except ValueError as e:
+                errors.append(f"Prompt node '{node_id}' has an invalid template ({e}); write literal braces as {{{{ and }}}}")
+                continue
+            connected = {edge.get("targetHandle") for edge in incoming[node_id]}
+            missing = sorted(template.variables - connected)
+            if missing:
+                errors.append(f"Prompt node '{node_id}' uses {', '.join('{' + name + '}' for name in missing)} but nothing is connected to it")
+            templates[node_id] = template
+        elif node.get("type") == "mapNode":
+            file_name = data.get("fileName")
+            if file_name and (file_name != os.path.basename(file_name) or file_name in (".", "..")):
+                errors.append(f"Map node '{node_id}' fileName '{file_name}' must be the name of an uploaded file, not a path")
+            if data.get("workflow"):
+                try:
+                    compile_workflow(data["workflow"])
+                except WorkflowValidationError as e:
+                    errors.extend(f"Map node '{node_id}' sub-workflow: {error}" for error in e.errors)
+            elif data.get("node"):
+                sub_node = data["node"]
+                sub_type = sub_node.get("type")
+                item_handle = data.get("itemHandle", "prompt")
+                if sub_type not in NODE_SPECS or sub_type in ("inputNode", "outputNode"):
+                    errors.append(f"Map node '{node_id}' cannot map over node type '{sub_type}'")
+                elif sub_type == "promptNode":
+                    try:
+                        template = get_template((sub_node.get("data") or {}).get("template", ""))
+                    except ValueError as e:
+                        errors.append(f"Map node '{node_id}' has an invalid template ({e})")
+                        continue
+                    if template.variables - {item_handle}:
+                        errors.append(f"Map node '{node_id}' template may only use {{{item_handle}}}")
+                elif item_handle not in NODE_SPECS[sub_type]["inputs"]:
+                    errors.append(
+                        f"Map node '{node_id}' feeds items to unknown input handle '{item_handle}' of {sub_type}; "
+                        f"set itemHandle to one of {', '.join(sorted(NODE_SPECS[sub_type]['inputs']))}"
+                    )
+
+    if errors:
+        raise WorkflowValidationError(errors)
+    return CompiledWorkflow(node_map, incoming, execution_order, templates)
+
+_compile_cache: "OrderedDict[str, Any]" = OrderedDict()
+_compile_lock = threading.Lock()
+
+def compile_cached(workflow_data: Dict[str, Any]) -> CompiledWorkflow:
+    """
+    compile_workflow with an LRU keyed by the workflow's content, so saving a
+    workflow compiles it once and every later run reuses the result (or the
+    validation error).
+    """
+    key = hashlib.sha256(json.dumps(workflow_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    with _compile_lock:
+        result = _compile_cache.get(key)
+        if result is not None:
+            _compile_cache.move_to_end(key)
+    if result is None:
+        try:
+            result = compile_workflow(workflow_data)
+        except WorkflowValidationError as e:
+            # Cache only the messages: a stored exception would accumulate the
+            # traceback (and request frames) of every run that re-raised it
+            result = list(e.errors)
+        with _compile_lock:
+            _compile_cache[key] = result
+            while len(_compile_cache) > COMPILE_CACHE_SIZE:
+                _compile_cache.popitem(last=False)
+    if isinstance(result, list):
+        raise WorkflowValidationError(result)
+    return result
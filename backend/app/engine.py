@@ -1,69 +1,64 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import asyncio
 import os
 from .nodes.llm import execute_llm_node
-from .nodes.rag import execute_rag_node
+from .nodes.rag import execute_rag_node, simple_text_splitter, extract_text
+from .compiler import CompiledWorkflow, PromptTemplate, compile_cached, get_template
 # from .nodes.search import execute_search_node
 
-async def run_workflow(workflow_data: Dict[str, Any], inputs: Dict[str, Any]) -> Dict[str, Any]:
-    nodes = workflow_data.get("nodes", [])
-    edges = workflow_data.get("edges", [])
+# Node types whose inputs are gathered into a list when several edges target the same handle
+FAN_IN_NODE_TYPES = {"reduceNode"}
 
-    # Map node ID to node data
-    node_map = {node["id"]: node for node in nodes}
-    
-    # Build adjacency list
-    adj = {node["id"]: [] for node in nodes}
-    in_degree = {node["id"]: 0 for node in nodes}
-    
-    for edge in edges:
-        source = edge["source"]
-        target = edge["target"]
-        if source in adj and target in adj:
-            adj[source].append(target)
-            in_degree[target] += 1
-
-    # Topological sort (BFS)
-    queue = [node_id for node_id, deg in in_degree.items() if deg == 0]
-    execution_order = []
-    
-    while queue:
-        u = queue.pop(0)
-        execution_order.append(u)
-        for v in adj[u]:
-            in_degree[v] -= 1
-            if in_degree[v] == 0:
-                queue.append(v)
-    
-    if len(execution_order) != len(nodes):
-        raise ValueError("Cycle detected in workflow")
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "8"))
+REDUCE_FAN_IN = 5
+
+# execute_llm_node reports failures as output text starting with one of these
+LLM_ERROR_PREFIXES = ("Error", "OpenAI Error", "Gemini Error")
+
+def resolve_handle(outputs: Any, source_handle: Optional[str]) -> Any:
+    """
+    Picks the value an edge carries from a node's outputs.
+    Nodes may return several named outputs; the edge's sourceHandle selects one,
+    falling back to "output" for single-output nodes.
+    """
+    if not isinstance(outputs, dict):
+        return outputs
+    if source_handle and source_handle in outputs:
+        return outputs[source_handle]
+    return outputs.get("output", outputs)
+
+async def run_workflow(workflow_data: Dict[str, Any], inputs: Dict[str, Any], compiled: Optional[CompiledWorkflow] = None) -> Dict[str, Any]:
+    # Validation happens here, before any node (and any paid API call) runs.
+    # Raises WorkflowValidationError; compiled graphs are cached by content.
+    if compiled is None:
+        compiled = compile_cached(workflow_data)
+    node_map = compiled.node_map
+    incoming = compiled.incoming
+    execution_order = compiled.execution_order
 
     # Execution State: Stores outputs of each node
     state = {}
-    
-    # Pre-populate state with inputs if there's an Input Node
-    # For simplicity, we assume one Input Node or we map inputs by key.
-    
-    final_outputs = {}
+    tasks: Dict[str, asyncio.Task] = {}
 
-    for node_id in execution_order:
+    async def run_node(node_id: str):
         node = node_map[node_id]
         node_type = node["type"]
-        
+
+        # Independent branches run concurrently: only wait for this node's own sources
+        sources = {edge["source"] for edge in incoming[node_id]}
+        await asyncio.gather(*(tasks[source_id] for source_id in sources))
+
         # Get inputs for this node from incoming edges
         node_inputs = {}
-        
-        # Find edges pointing to this node
-        incoming_edges = [e for e in edges if e["target"] == node_id]
-        for edge in incoming_edges:
+        for edge in incoming[node_id]:
             source_id = edge["source"]
-            source_handle = edge["sourceHandle"] # output identifier
-            target_handle = edge["targetHandle"] # input identifier
+            target_handle = edge.get("targetHandle") # input identifier
             
-            # Retrieve value from state
-            if source_id in state:
-                # Assuming state[source_id] is a dict of outputs or a single value
-                val = state[source_id].get("output", state[source_id])
+            # Retrieve value from state, routed by the edge's output identifier
+            val = resolve_handle(state[source_id], edge.get("sourceHandle"))
+            if node_type in FAN_IN_NODE_TYPES:
+                node_inputs.setdefault(target_handle, []).append(val)
+            else:
                 node_inputs[target_handle] = val
         
         # Add global inputs if this is an Input Node
@@ -75,16 +70,25 @@ async def run_workflow(workflow_data: Dict[str, Any], inputs: Dict[str, Any]) ->
 
         # Execute Node
         print(f"Executing node {node_id} ({node_type})")
-        output = await execute_node(node, node_inputs)
-        
-        state[node_id] = output
-        
-        if node_type == "outputNode":
-             final_outputs[node_id] = output
+        state[node_id] = await execute_node(node, node_inputs, template=compiled.templates.get(node_id))
+
+    # Tasks are created in topological order, so every source task already exists
+    for node_id in execution_order:
+        tasks[node_id] = asyncio.ensure_future(run_node(node_id))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    final_outputs = {}
+    for node_id in execution_order:
+        if node_map[node_id]["type"] == "outputNode":
+             final_outputs[node_id] = state[node_id]
 
     return final_outputs
 
-async def execute_node(node: Dict[str, Any], inputs: Dict[str, Any]) -> Any:
+async def execute_node(node: Dict[str, Any], inputs: Dict[str, Any], template: Optional[PromptTemplate] = None) -> Any:
     node_type = node["type"]
     data = node["data"]
     
@@ -121,15 +125,13 @@ async def execute_node(node: Dict[str, Any], inputs: Dict[str, Any]) -> Any:
         return await execute_llm_node(full_prompt, model, web_search=web_search, serp_key=serp_key)
     
     elif node_type == "promptNode":
-        template = data.get("template", "")
-        # format template with inputs
         # inputs might be {"topic": "AI"}
         # template might be "Tell me a joke about {topic}"
-        try:
-            formatted = template.format(**inputs)
-        except Exception as e:
-            formatted = template # Fallback
-        return {"output": formatted}
+        # The renderer is parsed (and its variables checked against the node's
+        # edges) when the workflow is compiled; parse here only for ad-hoc callers
+        if template is None:
+            template = get_template(data.get("template", ""))
+        return {"output": template.render(inputs)}
     
     elif node_type == "outputNode":
         return {"output": inputs.get("input", "")} # Pass through
@@ -139,5 +141,112 @@ async def execute_node(node: Dict[str, Any], inputs: Dict[str, Any]) -> Any:
         file_name = data.get("fileName", "")
         embedding_model = data.get("embeddingModel", "text-embedding-3-large")
         return await execute_rag_node(query, file_name, embedding_model)
+
+    elif node_type == "mapNode":
+        source = inputs.get("items", inputs.get("input", []))
+        file_name = data.get("fileName")
+        if file_name:
+            # Map over a whole uploaded document, e.g. map-reduce summarization of a PDF
+            file_path = os.path.join("uploads", file_name)
+            # fileName comes from workflow JSON: only plain names inside uploads/ are readable
+            uploads_dir = os.path.realpath("uploads")
+            if file_name != os.path.basename(file_name) or os.path.dirname(os.path.realpath(file_path)) != uploads_dir:
+                return {"output": f"Error: Invalid file name '{file_name}'."}
+            if not os.path.exists(file_path):
+                return {"output": f"Error: File '{file_name}' not found. Please upload it first."}
+            try:
+                source = await asyncio.to_thread(extract_text, file_path)
+            except Exception as e:
+                # e.g. a CSV or corrupt upload that PyMuPDF can't open
+                return {"output": f"Error: Could not read '{file_name}': {e}"}
+        return await execute_map_node(split_items(source, data), data)
+
+    elif node_type == "reduceNode":
+        items = []
+        for value in inputs.get("items", inputs.get("input", [])):
+            items.extend(value if isinstance(value, list) else [value])
+        return await execute_reduce_node(items, data)
         
     return {"output": None}
+
+def split_items(value: Any, data: Dict[str, Any]) -> List[Any]:
+    """
+    Turns a mapNode input into the list to fan out over.
+    Lists pass through; text is split on data.separator, or into chunks of data.chunkSize.
+    """
+    if isinstance(value, list):
+        return value
+    if value is None or value == "":
+        return []
+    text = str(value)
+    separator = data.get("separator")
+    if separator:
+        return [part for part in text.split(separator) if part.strip()]
+    chunk_size = int(data.get("chunkSize", 4000))
+    return simple_text_splitter(text, chunk_size=chunk_size, chunk_overlap=min(200, chunk_size // 5))
+
+async def execute_map_node(items: List[Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs a sub-execution per item, at most data.concurrency at a time, and gathers
+    the results in input order.
+
+    The sub-execution is either a whole sub-workflow (data.workflow, the item is
+    passed as the workflow input data.itemKey) or a single node (data.node, the
+    item is fed to its data.itemHandle input, "prompt" by default).
+    """
+    semaphore = asyncio.Semaphore(max(1, int(data.get("concurrency", MAP_CONCURRENCY))))
+    sub_workflow = data.get("workflow")
+    sub_node = data.get("node")
+    sub_compiled = compile_cached(sub_workflow) if sub_workflow else None
+    sub_template = None
+    if sub_node and sub_node.get("type") == "promptNode":
+        sub_template = get_template((sub_node.get("data") or {}).get("template", ""))
+
+    async def run_item(index: int, item: Any) -> Any:
+        async with semaphore:
+            if sub_workflow:
+                outputs = await run_workflow(sub_workflow, {data.get("itemKey", "item"): item}, compiled=sub_compiled)
+                results = [resolve_handle(output, None) for output in outputs.values()]
+                return results[0] if len(results) == 1 else outputs
+            if sub_node:
+                node = {**sub_node, "id": f"{sub_node.get('id', 'map')}[{index}]"}
+                node.setdefault("data", {})
+                output = await execute_node(node, {data.get("itemHandle", "prompt"): item}, template=sub_template)
+                return resolve_handle(output, None)
+            return item
+
+    results = await asyncio.gather(*(run_item(i, item) for i, item in enumerate(items)))
+    return {"output": results, "results": results, "items": items, "count": len(results)}
+
+async def execute_reduce_node(items: List[Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merges a list into one output.
+    Without a model the items are joined with data.separator. With data.model the
+    items are combined by the LLM in groups of data.fanIn, level by level, with each
+    level's groups running in parallel - so the number of sequential LLM calls grows
+    with log(len(items)), not with len(items). A failed LLM call stops the reduction
+    rather than having its error text summarized by the next level.
+    """
+    texts = [str(item) for item in items if item is not None and item != ""]
+    model = data.get("model")
+    if not model:
+        return {"output": data.get("separator", "\n\n").join(texts)}
+
+    fan_in = max(2, int(data.get("fanIn", REDUCE_FAN_IN)))
+    semaphore = asyncio.Semaphore(max(1, int(data.get("concurrency", MAP_CONCURRENCY))))
+    instruction = data.get("prompt", "Combine the following into a single coherent summary.")
+
+    async def combine(group: List[str]) -> str:
+        async with semaphore:
+            prompt = f"{instruction}\n\n" + "\n\n---\n\n".join(group)
+            result = await execute_llm_node(prompt, model)
+            return str(result.get("output", ""))
+
+    while len(texts) > 1:
+        groups = [texts[i:i + fan_in] for i in range(0, len(texts), fan_in)]
+        texts = await asyncio.gather(*(combine(group) for group in groups))
+        failed = next((text for text in texts if text.startswith(LLM_ERROR_PREFIXES)), None)
+        if failed is not None:
+            return {"output": f"Error: Reduce failed: {failed}"}
+
+    return {"output": texts[0] if texts else ""}
@@ -1,25 +1,40 @@
 import os
+import asyncio
 import openai
 import google.generativeai as genai
 import requests
 from typing import Dict, Any
+from .singleflight import SingleFlight, make_key
+from .llm_router import LLMRouter, ProviderError
+
+SERP_API_URL = os.getenv("SERP_API_URL", "https://serpapi.com/search")
+
+# Identical concurrent calls (e.g. many users running the same workflow) share one upstream request
+_search_flight = SingleFlight()
+_llm_flight = SingleFlight()
 
 async def perform_web_search(query: str, api_key: str) -> str:
     """
     Performs a web search using SerpAPI.
+    Concurrent identical searches are coalesced into a single request.
     """
+    key = make_key("search", (query or "").strip(), api_key)
+    return await _search_flight.do(key, lambda: _perform_web_search(query, api_key))
+
+async def _perform_web_search(query: str, api_key: str) -> str:
     if not api_key:
         return "Error: No SerpAPI Key provided for Web Search."
     
     print(f"[DEBUG] Performing Web Search for: {query}")
     try:
-        url = "https://serpapi.com/search"
+        url = SERP_API_URL
         params = {
             "q": query,
             "api_key": api_key,
             "engine": "google"
         }
-        response = requests.get(url, params=params)
+        # requests is blocking; keep it off the event loop
+        response = await asyncio.to_thread(requests.get, url, params=params)
         results = response.json()
         
         if "error" in results:
@@ -41,6 +56,14 @@ async def perform_web_search(query: str, api_key: str) -> str:
         return f"Web Search connection error: {str(e)}"
 
 async def execute_llm_node(prompt: str, model_name: str, web_search: bool = False, serp_key: str = None) -> Dict[str, Any]:
+    """
+    Runs the prompt against the selected model.
+    Concurrent identical calls are coalesced into a single provider request.
+    """
+    key = make_key("llm", (model_name or "").strip().lower(), prompt, bool(web_search), serp_key if web_search else None)
+    return await _llm_flight.do(key, lambda: _execute_llm_node(prompt, model_name, web_search, serp_key))
+
+async def _execute_llm_node(prompt: str, model_name: str, web_search: bool = False, serp_key: str = None) -> Dict[str, Any]:
     
     # Inject Web Search context if enabled
     if web_search:
@@ -48,19 +71,16 @@ async def execute_llm_node(prompt: str, model_name: str, web_search: bool = Fals
         prompt = f"{search_context}\n\nUser Prompt: {prompt}"
 
     try:
-        if "gpt" in model_name.lower():
-            return await run_openai(prompt, model_name)
-        elif "gemini" in model_name.lower():
-            return await run_gemini(prompt, model_name)
-        else:
-            return {"output": "Error: Unsupported model"}
+        return await llm_router.generate(prompt, model_name)
+    except ProviderError as e:
+        return {"output": str(e)}
     except Exception as e:
         return {"output": f"Error generating response: {str(e)}"}
 
 async def run_openai(prompt: str, model: str) -> Dict[str, Any]:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
-        return {"output": "Error: OPENAI_API_KEY not found"}
+        raise ProviderError("Error: OPENAI_API_KEY not found")
     
     client = openai.AsyncOpenAI(api_key=api_key)
     try:
@@ -70,12 +90,12 @@ async def run_openai(prompt: str, model: str) -> Dict[str, Any]:
         )
         return {"output": response.choices[0].message.content}
     except Exception as e:
-        return {"output": f"OpenAI Error: {str(e)}"}
+        raise ProviderError(f"OpenAI Error: {str(e)}") from e
 
 async def run_gemini(prompt: str, model: str) -> Dict[str, Any]:
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
-        return {"output": "Error: GOOGLE_API_KEY not found"}
+        raise ProviderError("Error: GOOGLE_API_KEY not found")
     
     genai.configure(api_key=api_key)
     try:
@@ -85,4 +105,7 @@ async def run_gemini(prompt: str, model: str) -> Dict[str, Any]:
         response = await gemini_model.generate_content_async(prompt)
         return {"output": response.text}
     except Exception as e:
-        return {"output": f"Gemini Error: {str(e)}"}
+        raise ProviderError(f"Gemini Error: {str(e)}") from e
+
+# Substring routing ("gpt" -> OpenAI, "gemini" -> Gemini) with hedging, failover and circuit breakers
+llm_router = LLMRouter(providers=[("gpt", run_openai), ("gemini", run_gemini)])
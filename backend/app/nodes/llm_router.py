@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+from prometheus_client import Counter, Gauge, Histogram
+
+# A provider takes (prompt, model) and returns {"output": ...}, raising on failure
+Provider = Callable[[str, str], Awaitable[Dict[str, Any]]]
+
+# Per-model latency SLO (p95 target, in ms) and the model to hedge/fall back to.
+# Override or extend with LLM_ROUTES='{"gpt-4": {"slo_ms": 6000, "fallback": "gpt-4o-mini"}}'
+DEFAULT_ROUTES: Dict[str, Dict[str, Any]] = {
+    "gpt-4": {"slo_ms": 8000, "fallback": "gpt-4o-mini"},
+    "gpt-4o-mini": {"slo_ms": 4000, "fallback": "gemini-1.5-flash"},
+    "gpt-3.5-turbo": {"slo_ms": 4000, "fallback": "gemini-1.5-flash"},
+    "gemini-1.5-flash": {"slo_ms": 4000, "fallback": "gpt-4o-mini"},
+    "gemini-pro": {"slo_ms": 6000, "fallback": "gpt-4o-mini"},
+}
+DEFAULT_SLO_MS = float(os.getenv("LLM_DEFAULT_SLO_MS", "5000"))
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Model names come from user-editable workflow JSON, so breakers, latency windows
+# and metric labels are keyed by configured route; anything else shares one bucket
+# per provider ("other:gpt", "other:gemini"), so a bad model string can only trip
+# the breaker for unconfigured models of its own provider
+OTHER_ROUTE = "other"
+
+# Observed latency only drives hedging once there are enough samples to trust the p95
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+ROUTE_DECISIONS = Counter(
+    "llm_route_decisions_total",
+    "LLM routing decisions by requested model, serving model and decision",
+    ["model", "served_by", "decision"],
+)
+PROVIDER_LATENCY = Histogram(
+    "llm_provider_latency_seconds",
+    "Latency of individual LLM provider calls",
+    ["model", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64),
+)
+BREAKER_STATE = Gauge(
+    "llm_circuit_open",
+    "1 while the circuit breaker for a model is open or half-open, 0 when closed",
+    ["model"],
+)
+
+class ProviderError(Exception):
+    """
+    Raised by providers when a call fails. The message is user-facing.
+    """
+
+class UnsupportedModelError(ProviderError):
+    pass
+
+def load_routes() -> Dict[str, Dict[str, Any]]:
+    routes = {name: dict(route) for name, route in DEFAULT_ROUTES.items()}
+    overrides = os.getenv("LLM_ROUTES")
+    if overrides:
+        for name, route in json.loads(overrides).items():
+            routes.setdefault(name, {}).update(route)
+    return routes
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `cooldown` seconds. After the cooldown a single probe call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, model: str, failure_threshold: int, cooldown: float, clock: Callable[[], float]):
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open":
+            # Restart the cooldown so only this caller probes the provider
+            self.opened_at = self.clock()
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        BREAKER_STATE.labels(model=self.model).set(0)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+            BREAKER_STATE.labels(model=self.model).set(1)
+
+class LLMRouter:
+    """
+    Routes a prompt to the provider for a model, hedging to the model's fallback
+    when the primary is slower than its p95 and failing over when the primary
+    errors or its circuit is open.
+
+    Providers are matched by substring of the model name, in order, so tests can
+    pass fake providers (e.g. [("fake", fake_provider)]) and a manual clock.
+    """
+
+    def __init__(
+        self,
+        providers: List[Tuple[str, Provider]],
+        routes: Optional[Dict[str, Dict[str, Any]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN_SECONDS,
+    ):
+        self.providers = providers
+        self.routes = routes if routes is not None else load_routes()
+        self.clock = clock
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[str, deque] = {}
+
+    def _match(self, model: str) -> Optional[Tuple[str, Provider]]:
+        name = model.lower()
+        for match, provider in self.providers:
+            if match in name:
+                return match, provider
+        return None
+
+    def provider_for(self, model: str) -> Optional[Provider]:
+        matched = self._match(model)
+        return matched[1] if matched else None
+
+    def route_key(self, model: str) -> str:
+        if model in self.routes:
+            return model
+        matched = self._match(model)
+        return f"{OTHER_ROUTE}:{matched[0]}" if matched else OTHER_ROUTE
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        key = self.route_key(model)
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(key, self.failure_threshold, self.cooldown, self.clock)
+        return self.breakers[key]
+
+    def slo_seconds(self, model: str) -> float:
+        return self.routes.get(model, {}).get("slo_ms", DEFAULT_SLO_MS) / 1000
+
+    def p95(self, model: str) -> Optional[float]:
+        samples = self.latencies.get(self.route_key(model))
+        if not samples or len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def hedge_delay(self, model: str) -> float:
+        # Hedge at the observed p95, but never wait longer than the SLO allows
+        slo = self.slo_seconds(model)
+        observed = self.p95(model)
+        return slo if observed is None else min(observed, slo)
+
+    def fallback_for(self, model: str) -> Optional[str]:
+        fallback = self.routes.get(model, {}).get("fallback")
+        if not fallback or fallback == model or self.provider_for(fallback) is None:
+            return None
+        return fallback
+
+    async def _call(self, model: str, prompt: str) -> Dict[str, Any]:
+        provider = self.provider_for(model)
+        breaker = self.breaker(model)
+        key = self.route_key(model)
+        start = self.clock()
+        try:
+            result = await provider(prompt, model)
+        except asyncio.CancelledError:
+            # Lost a hedge race; says nothing about provider health
+            raise
+        except Exception:
+            PROVIDER_LATENCY.labels(model=key, outcome="error").observe(self.clock() - start)
+            breaker.record_failure()
+            raise
+        elapsed = self.clock() - start
+        PROVIDER_LATENCY.labels(model=key, outcome="success").observe(elapsed)
+        self.latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(elapsed)
+        breaker.record_success()
+        return result
+
+    def _record(self, model: str, served_by: str, decision: str):
+        ROUTE_DECISIONS.labels(
+            model=self.route_key(model), served_by=self.route_key(served_by), decision=decision
+        ).inc()
+
+    async def generate(self, prompt: str, model: str) -> Dict[str, Any]:
+        if self.provider_for(model) is None:
+            raise UnsupportedModelError("Error: Unsupported model")
+
+        fallback = self.fallback_for(model)
+
+        if not self.breaker(model).allow():
+            if fallback and self.breaker(fallback).allow():
+                self._record(model, fallback, "circuit_open")
+                return await self._call(fallback, prompt)
+            self._record(model, model, "rejected")
+            raise ProviderError(f"Error: {model} is temporarily unavailable. Please try again shortly.")
+
+        if fallback is None:
+            self._record(model, model, "primary")
+            return await self._call(model, prompt)
+
+        primary = asyncio.ensure_future(self._call(model, prompt))
+        tasks = {primary: model}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(model))
+            if primary in done:
+                if primary.exception() is None:
+                    self._record(model, model, "primary")
+                    return primary.result()
+                if not self.breaker(fallback).allow():
+                    raise primary.exception()
+                self._record(model, fallback, "failover")
+                try:
+                    return await self._call(fallback, prompt)
+                except Exception:
+                    # Report the requested model's error rather than the fallback's
+                    raise primary.exception()
+
+            if not self.breaker(fallback).allow():
+                self._record(model, model, "primary")
+                return await primary
+
+            # Primary is past its p95: race a hedged request against it
+            hedge = asyncio.ensure_future(self._call(fallback, prompt))
+            tasks[hedge] = fallback
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record(model, tasks[task], "hedge")
+                        return task.result()
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
@@ -1,13 +1,19 @@
 import os
+import asyncio
 import fitz # pymupdf
 import chromadb
 from chromadb.utils import embedding_functions
+from .singleflight import SingleFlight, make_key
 
 # Initialize ChromaDB Client
 # Using a local persistent path
 CHROMA_DB_DIR = "chroma_db"
 chroma_client = chromadb.PersistentClient(path=CHROMA_DB_DIR)
 
+# Identical concurrent queries share one retrieval; ingestion is keyed per collection
+_query_flight = SingleFlight()
+_ingest_flight = SingleFlight()
+
 def simple_text_splitter(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list[str]:
     """
     Simple recursive-like text splitter.
@@ -46,8 +52,44 @@ def simple_text_splitter(text: str, chunk_size: int = 1000, chunk_overlap: int =
 async def execute_rag_node(query: str, file_name: str, embedding_model: str = "text-embedding-3-large") -> dict:
     """
     Executes the RAG node logic with real embedding and retrieval.
+    Concurrent identical queries are coalesced into a single retrieval.
     """
-    
+    key = make_key("rag", query, file_name, embedding_model)
+    return await _query_flight.do(key, lambda: _execute_rag_node(query, file_name, embedding_model))
+
+def extract_text(file_path: str) -> str:
+    """
+    Extracts the full text of an uploaded document (blocking).
+    """
+    doc = fitz.open(file_path)
+    text = ""
+    for page in doc:
+        text += page.get_text()
+    return text
+
+def _index_document(collection, file_path: str, file_name: str):
+    """
+    Extracts, splits and indexes the document unless the collection already has data.
+    """
+    # Naive check: count > 0. Re-checked here so a caller that arrives after an
+    # ingestion finished does not index the same document twice.
+    if collection.count() > 0:
+        return
+
+    text = extract_text(file_path)
+
+    # Split text
+    chunks = simple_text_splitter(text, chunk_size=1000, chunk_overlap=200)
+
+    # Add to Chroma
+    ids = [f"id{i}" for i in range(len(chunks))]
+    collection.add(
+        documents=chunks,
+        ids=ids
+    )
+    print(f"Indexed {len(chunks)} chunks for {file_name}")
+
+async def _execute_rag_node(query: str, file_name: str, embedding_model: str) -> dict:
     if not query:
         return {"output": "Error: No query provided_for Knowledge Base."}
     
@@ -69,32 +111,25 @@ async def execute_rag_node(query: str, file_name: str, embedding_model: str = "t
         # We use OpenAI embeddings
         openai_ef = embedding_functions.OpenAIEmbeddingFunction(
                 api_key=os.getenv("OPENAI_API_KEY"),
-                model_name=embedding_model
+                model_name=embedding_model,
+                api_base=os.getenv("OPENAI_BASE_URL") # e.g. a local stand-in for benchmarks
             )
         
-        collection = chroma_client.get_or_create_collection(name=collection_name, embedding_function=openai_ef)
+        collection = await asyncio.to_thread(
+            chroma_client.get_or_create_collection, name=collection_name, embedding_function=openai_ef
+        )
         
-        # 2. Check if data is already indexed (naive check: count > 0)
-        if collection.count() == 0:
-            # Ingest and Index
-            doc = fitz.open(file_path)
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            
-            # Split text
-            chunks = simple_text_splitter(text, chunk_size=1000, chunk_overlap=200)
-            
-            # Add to Chroma
-            ids = [f"id{i}" for i in range(len(chunks))]
-            collection.add(
-                documents=chunks,
-                ids=ids
-            )
-            print(f"Indexed {len(chunks)} chunks for {file_name}")
+        # 2. Index once per collection. Ingestion runs in a worker thread, so
+        # concurrent cold-document calls join the same in-flight ingestion
+        # instead of racing to index the collection in parallel.
+        await _ingest_flight.do(
+            collection_name,
+            lambda: asyncio.to_thread(_index_document, collection, file_path, file_name)
+        )
 
         # 3. Query
-        results = collection.query(
+        results = await asyncio.to_thread(
+            collection.query,
             query_texts=[query],
             n_results=3
         )
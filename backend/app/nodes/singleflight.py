@@ -0,0 +1,36 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+def make_key(*parts: Any) -> str:
+    """
+    Builds a stable key for a call from its (JSON-serializable) arguments.
+    """
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight task.
+
+    The first caller for a key starts the work; every caller that arrives while
+    it is still running awaits the same task and receives the same result (or
+    exception). Once the task finishes the key is released, so later calls run
+    fresh - this is de-duplication, not caching.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller going away does not cancel the work for the others
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
@@ -14,6 +14,8 @@ class Workflow(WorkflowBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # Only set on create/update: problems that would make a run be rejected
+    validation_errors: Optional[List[str]] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,78 @@
+"""
+Local stand-ins for OpenAI (chat + embeddings) and SerpAPI with configurable latency.
+
+Run with: uvicorn benchmarks.fake_providers:app --port 9100
+Latency is set with BENCH_LLM_LATENCY_MS, BENCH_EMBED_LATENCY_MS,
+BENCH_SEARCH_LATENCY_MS and BENCH_JITTER_MS (uniform +/- jitter).
+"""
+import os
+import time
+import base64
+import random
+import struct
+import asyncio
+import hashlib
+from fastapi import FastAPI, Request
+
+LLM_LATENCY_MS = float(os.getenv("BENCH_LLM_LATENCY_MS", "300"))
+EMBED_LATENCY_MS = float(os.getenv("BENCH_EMBED_LATENCY_MS", "50"))
+SEARCH_LATENCY_MS = float(os.getenv("BENCH_SEARCH_LATENCY_MS", "200"))
+JITTER_MS = float(os.getenv("BENCH_JITTER_MS", "0"))
+EMBED_DIM = 64
+
+app = FastAPI(title="Fake Providers")
+
+async def simulate_latency(base_ms: float):
+    delay = max(0.0, base_ms + random.uniform(-JITTER_MS, JITTER_MS))
+    await asyncio.sleep(delay / 1000)
+
+def fake_embedding(text: str) -> list[float]:
+    # Deterministic so repeated queries hit the same neighbours
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(digest[i % len(digest)] - 128) / 128 for i in range(EMBED_DIM)]
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await simulate_latency(LLM_LATENCY_MS)
+    prompt = body["messages"][-1]["content"]
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": f"Fake answer ({len(prompt)} chars of prompt)"},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 8, "total_tokens": len(prompt) // 4 + 8},
+    }
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    await simulate_latency(EMBED_LATENCY_MS)
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    data = []
+    for index, text in enumerate(inputs):
+        vector = fake_embedding(str(text))
+        if body.get("encoding_format") == "base64":
+            vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+        data.append({"object": "embedding", "index": index, "embedding": vector})
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "fake"),
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+@app.get("/search")
+async def search(q: str = ""):
+    await simulate_latency(SEARCH_LATENCY_MS)
+    return {
+        "organic_results": [
+            {"title": f"Result {i} for {q}", "snippet": f"Snippet {i} about {q}."}
+            for i in range(3)
+        ]
+    }
@@ -0,0 +1,367 @@
+"""
+End-to-end load and latency benchmark for the workflow API.
+
+Starts the fake providers and the FastAPI app as separate uvicorn processes,
+points the app at the fakes, drives each scenario with concurrent clients and
+reports p50/p95/p99 latency and throughput. Results can be saved as a baseline
+and later runs compared against it.
+
+Run from backend/:
+    python -m benchmarks.run                      # run and print the report
+    python -m benchmarks.run --save-baseline      # store results in benchmarks/baselines.json
+    python -m benchmarks.run --compare            # exit 1 if a scenario regressed
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import socket
+import argparse
+import asyncio
+import tempfile
+import subprocess
+from typing import Dict, Any, List, Optional
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+BENCH_PDF = "bench.pdf"
+MAP_SECTIONS = 16
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def node(node_id: str, node_type: str, **data) -> Dict[str, Any]:
+    return {"id": node_id, "type": node_type, "data": data}
+
+def edge(source: str, target: str, source_handle: str, target_handle: str) -> Dict[str, Any]:
+    return {"source": source, "target": target, "sourceHandle": source_handle, "targetHandle": target_handle}
+
+# Workflow shapes exercised through /run/{workflow_id}
+WORKFLOWS: Dict[str, Dict[str, Any]] = {
+    "llm": {
+        "nodes": [node("in", "inputNode", key="input"), node("llm", "llmNode", model="gpt-4o-mini"), node("out", "outputNode")],
+        "edges": [edge("in", "llm", "value", "prompt"), edge("llm", "out", "output", "input")],
+    },
+    "prompt_llm": {
+        "nodes": [
+            node("in", "inputNode", key="input"),
+            node("prompt", "promptNode", template="Explain {input} in 5 words"),
+            node("llm", "llmNode", model="gpt-4o-mini"),
+            node("out", "outputNode"),
+        ],
+        "edges": [edge("in", "prompt", "value", "input"), edge("prompt", "llm", "output", "prompt"), edge("llm", "out", "output", "input")],
+    },
+    "web_search": {
+        "nodes": [node("in", "inputNode", key="input"), node("llm", "llmNode", model="gpt-4o-mini", webSearch=True), node("out", "outputNode")],
+        "edges": [edge("in", "llm", "value", "prompt"), edge("llm", "out", "output", "input")],
+    },
+    "rag": {
+        "nodes": [
+            node("in", "inputNode", key="input"),
+            node("rag", "ragNode", fileName=BENCH_PDF),
+            node("llm", "llmNode", model="gpt-4o-mini"),
+            node("out", "outputNode"),
+        ],
+        "edges": [
+            edge("in", "rag", "value", "query"),
+            edge("in", "llm", "value", "prompt"),
+            edge("rag", "llm", "context", "context"),
+            edge("llm", "out", "output", "input"),
+        ],
+    },
+    "map_reduce": {
+        "nodes": [
+            node("in", "inputNode", key="input"),
+            node("map", "mapNode", separator="\n\n", node={"type": "llmNode", "data": {"model": "gpt-4o-mini", "prompt": "Summarize:"}}),
+            node("reduce", "reduceNode", model="gpt-4o-mini", fanIn=4),
+            node("out", "outputNode"),
+        ],
+        "edges": [edge("in", "map", "value", "items"), edge("map", "reduce", "results", "items"), edge("reduce", "out", "output", "input")],
+    },
+}
+
+def make_pdf() -> bytes:
+    import fitz
+    doc = fitz.open()
+    for page_number in range(5):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Benchmark document page {page_number}.\n" + "Lorem ipsum dolor sit amet. " * 40)
+    return doc.tobytes()
+
+# Node failures come back as HTTP 200 with one of these at the start of the output
+ERROR_PREFIXES = ("error", "warning", "openai error", "gemini error", "serpapi error", "web search connection error")
+
+def output_failed(value: Any) -> bool:
+    if isinstance(value, dict):
+        value = value.get("output")
+    if isinstance(value, list):
+        return any(output_failed(item) for item in value)
+    return isinstance(value, str) and value.strip().lower().startswith(ERROR_PREFIXES)
+
+def response_failed(response: httpx.Response) -> bool:
+    if response.status_code >= 400:
+        return True
+    if not response.request.url.path.startswith("/api/run/"):
+        return False
+    try:
+        results = response.json().get("results", {})
+    except ValueError:
+        return True
+    return any(output_failed(output) for output in results.values())
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    # Nearest-rank: the smallest sample with at least pct% of samples at or below it
+    ordered = sorted(samples)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+class Servers:
+    """
+    Runs the fake providers and the app in a scratch directory, so the app's
+    relative uploads/, chroma_db/ and sqlite paths never touch the working tree.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.TemporaryDirectory(prefix="genai-bench-")
+        self.fake_port = free_port()
+        self.app_port = free_port()
+        self.processes: List[subprocess.Popen] = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.app_port}"
+
+    def _spawn(self, target: str, port: int, env: Dict[str, str]):
+        command = [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port),
+                   "--log-level", "warning", "--workers", str(self.args.workers if target.startswith("app.") else 1)]
+        self.processes.append(subprocess.Popen(
+            command, cwd=self.workdir.name, env=env,
+            stdout=subprocess.DEVNULL if not self.args.verbose else None,
+            stderr=subprocess.DEVNULL if not self.args.verbose else None,
+        ))
+
+    def start(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+        fake_env = dict(env,
+                        BENCH_LLM_LATENCY_MS=str(self.args.llm_latency_ms),
+                        BENCH_EMBED_LATENCY_MS=str(self.args.embed_latency_ms),
+                        BENCH_SEARCH_LATENCY_MS=str(self.args.search_latency_ms),
+                        BENCH_JITTER_MS=str(self.args.jitter_ms))
+        fake_url = f"http://127.0.0.1:{self.fake_port}"
+        app_env = dict(env,
+                       OPENAI_API_KEY="bench",
+                       OPENAI_BASE_URL=f"{fake_url}/v1",
+                       SERP_API_KEY="bench",
+                       SERP_API_URL=f"{fake_url}/search",
+                       DATABASE_URL=f"sqlite:///{os.path.join(self.workdir.name, 'bench.db')}")
+        # Gemini has no stand-in: keep hedges and failovers on the fake OpenAI models
+        app_env.setdefault("LLM_ROUTES", json.dumps({"gpt-4o-mini": {"fallback": None}}))
+        os.makedirs(os.path.join(self.workdir.name, "uploads"), exist_ok=True)
+        self._spawn("benchmarks.fake_providers:app", self.fake_port, fake_env)
+        self._spawn("app.main:app", self.app_port, app_env)
+        for url in (fake_url, self.base_url):
+            self._wait_ready(url)
+
+    def _wait_ready(self, url: str, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if any(process.poll() is not None for process in self.processes):
+                raise RuntimeError("A benchmark server exited during startup (re-run with --verbose)")
+            try:
+                if httpx.get(f"{url}/openapi.json", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"Timed out waiting for {url}")
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.workdir.cleanup()
+
+async def drive(name: str, send, total: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Closed-loop load: `concurrency` clients issue `total` requests between them.
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await send(i)
+                ok = not response_failed(response)
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += 0 if ok else 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "throughput_rps": round(total / wall, 2) if wall else 0.0,
+    }
+
+async def run_benchmarks(args, base_url: str) -> Dict[str, Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=f"{base_url}/api", timeout=args.timeout, limits=limits) as client:
+        pdf = make_pdf()
+        response = await client.post("/upload", files={"file": (BENCH_PDF, pdf, "application/pdf")})
+        response.raise_for_status()
+
+        workflow_ids = {}
+        for name, data in WORKFLOWS.items():
+            response = await client.post("/workflows/", json={"name": f"bench-{name}", "data": data})
+            response.raise_for_status()
+            workflow_ids[name] = response.json()["id"]
+
+        def run_input(name: str, i: int) -> str:
+            # Unique inputs by default; --identical measures request coalescing instead
+            suffix = "" if args.identical else f" #{i}"
+            if name == "map_reduce":
+                return "\n\n".join(f"Section {s}: some text to summarize{suffix}" for s in range(MAP_SECTIONS))
+            return f"What is the benchmark about?{suffix}"
+
+        scenarios = {}
+        for name, workflow_id in workflow_ids.items():
+            scenarios[f"run:{name}"] = (lambda i, name=name, workflow_id=workflow_id:
+                                        client.post(f"/run/{workflow_id}", json={"inputs": {"input": run_input(name, i)}}))
+        scenarios["upload"] = lambda i: client.post(
+            "/upload", files={"file": (f"bench-{uuid.uuid4().hex}.txt", b"benchmark upload " * 64, "text/plain")})
+        scenarios["chat_log"] = lambda i: client.post(
+            "/chat/log", json={"session_id": "bench", "workflow_id": workflow_ids["llm"],
+                               "user_message": f"hello {i}", "ai_response": "hi"})
+
+        results = {}
+        for name, send in scenarios.items():
+            if args.only and not any(selected in name for selected in args.only):
+                continue
+            # Warm-up also indexes the benchmark PDF before the rag scenario is measured
+            await drive(name, send, args.warmup, min(args.warmup, args.concurrency) or 1)
+            results[name] = await drive(name, send, args.requests, args.concurrency)
+            print(f"{name:<16} {format_result(results[name])}")
+        return results
+
+def format_result(result: Dict[str, Any]) -> str:
+    return (f"p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms  "
+            f"{result['throughput_rps']:>8.2f} req/s  errors {result['errors']}/{result['requests']}")
+
+def config_of(args) -> Dict[str, Any]:
+    return {
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "workers": args.workers,
+        "identical": args.identical,
+        "llm_latency_ms": args.llm_latency_ms,
+        "embed_latency_ms": args.embed_latency_ms,
+        "search_latency_ms": args.search_latency_ms,
+        "jitter_ms": args.jitter_ms,
+    }
+
+def load_baselines(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms vs baseline {previous['p95_ms']} ms")
+        if result["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput_rps']} req/s vs baseline {previous['throughput_rps']} req/s")
+        if result["errors"] > previous["errors"]:
+            regressions.append(f"{name}: {result['errors']} errors vs baseline {previous['errors']}")
+    return regressions
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the workflow API")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients per scenario")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the app")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--embed-latency-ms", type=float, default=50)
+    parser.add_argument("--search-latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--identical", action="store_true", help="send identical inputs (exercises request coalescing)")
+    parser.add_argument("--only", nargs="*", help="run only scenarios whose name contains one of these")
+    parser.add_argument("--baseline-file", default=BASELINE_PATH)
+    parser.add_argument("--baseline-name", default="default", help="key under which the baseline is stored")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="exit 1 if a scenario regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show server logs")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    servers = Servers(args)
+    try:
+        servers.start()
+        results = asyncio.run(run_benchmarks(args, servers.base_url))
+    finally:
+        servers.stop()
+
+    report = {"config": config_of(args), "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baselines = load_baselines(args.baseline_file)
+    status = 0
+    if args.compare:
+        baseline = baselines.get(args.baseline_name)
+        if baseline is None:
+            print(f"No baseline named '{args.baseline_name}' in {args.baseline_file}")
+            status = 1
+        else:
+            if baseline.get("config") != report["config"]:
+                print("Warning: baseline was recorded with a different configuration")
+            regressions = compare(results, baseline, args.tolerance)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            status = 1 if regressions else 0
+            if not regressions:
+                print("No regressions against baseline")
+
+    if args.save_baseline:
+        baselines[args.baseline_name] = report
+        with open(args.baseline_file, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Saved baseline '{args.baseline_name}' to {args.baseline_file}")
+
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# The app uses cwd-relative paths (sql_app.db, chroma_db/, uploads/): run the
+# suite from a scratch directory so imports and tests never write into the tree
+os.chdir(tempfile.mkdtemp(prefix="genai-tests-"))
+os.makedirs("uploads", exist_ok=True)
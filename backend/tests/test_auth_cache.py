@@ -0,0 +1,79 @@
+import time
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models, schemas
+from app.auth import cache, security
+from app.auth.router import get_current_user
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    cache.token_cache.clear()
+    cache.user_cache.clear()
+    yield session
+    session.close()
+    cache.token_cache.clear()
+    cache.user_cache.clear()
+
+def add_user(db, email):
+    user = models.User(email=email, hashed_password="x")
+    db.add(user)
+    db.commit()
+    cache.user_cache.set(email, schemas.User.model_validate(user))
+    return user
+
+def test_update_evicts_cached_user(db):
+    user = add_user(db, "a@example.com")
+
+    user.is_active = False
+    db.commit()
+
+    assert cache.user_cache.get("a@example.com") is None
+
+def test_email_change_evicts_old_address(db):
+    user = add_user(db, "old@example.com")
+    cache.user_cache.set("new@example.com", "stale")
+
+    user.email = "new@example.com"
+    db.commit()
+
+    assert cache.user_cache.get("old@example.com") is None
+    assert cache.user_cache.get("new@example.com") is None
+
+def test_delete_evicts_cached_user(db):
+    user = add_user(db, "gone@example.com")
+
+    db.delete(user)
+    db.commit()
+
+    assert cache.user_cache.get("gone@example.com") is None
+
+def test_ttl_is_capped_at_cache_ttl_and_skipped_when_expired():
+    ttl_cache = cache.TTLCache(ttl=60, max_entries=10)
+
+    ttl_cache.set("short", 1, ttl=0.05)
+    ttl_cache.set("long", 2, ttl=3600)
+    ttl_cache.set("expired", 3, ttl=-1)
+
+    assert ttl_cache._data["long"][1] - time.monotonic() <= 60
+    assert "expired" not in ttl_cache._data
+    time.sleep(0.1)
+    assert ttl_cache.get("short") is None
+    assert ttl_cache.get("long") == 2
+
+def test_token_is_not_cached_past_its_expiry(db):
+    user = add_user(db, "a@example.com")
+    token = security.create_access_token({"sub": user.email}, expires_delta=timedelta(seconds=5))
+
+    result = asyncio.run(get_current_user(token))
+
+    assert result.email == "a@example.com"
+    assert cache.token_cache.get(token) == "a@example.com"
+    assert cache.token_cache._data[token][1] - time.monotonic() <= 5
@@ -0,0 +1,130 @@
+import pytest
+
+from app.compiler import compile_cached, compile_workflow, WorkflowValidationError
+
+def invalid_workflow():
+    return {"nodes": [{"id": "x", "type": "unknownNode", "data": {}}], "edges": []}
+
+def test_cached_validation_error_is_fresh_each_time():
+    errors = []
+    for _ in range(3):
+        with pytest.raises(WorkflowValidationError) as exc_info:
+            compile_cached(invalid_workflow())
+        errors.append(exc_info.value)
+
+    assert errors[0] is not errors[1]
+    assert errors[2].errors == ["Node 'x' has unknown type 'unknownNode'"]
+
+def map_over(sub_node, **data):
+    return {
+        "nodes": [{"id": "m", "type": "mapNode", "data": {"node": sub_node, **data}}],
+        "edges": [],
+    }
+
+def test_map_item_handle_is_checked_for_every_node_type():
+    rag = {"type": "ragNode", "data": {"fileName": "doc.pdf"}}
+
+    with pytest.raises(WorkflowValidationError, match="unknown input handle 'prompt' of ragNode"):
+        compile_cached(map_over(rag))
+
+    compile_cached(map_over(rag, itemHandle="query"))
+    compile_cached(map_over({"type": "llmNode", "data": {"model": "gpt-4"}}))
+
+@pytest.mark.parametrize("file_name", ["../sql_app.db", "/etc/passwd", "sub/doc.pdf", ".."])
+def test_map_file_name_must_not_be_a_path(file_name):
+    with pytest.raises(WorkflowValidationError, match="must be the name of an uploaded file"):
+        compile_cached(map_over({"type": "llmNode", "data": {}}, fileName=file_name))
+
+    compile_cached(map_over({"type": "llmNode", "data": {}}, fileName="doc.pdf"))
+
+def errors_of(workflow):
+    with pytest.raises(WorkflowValidationError) as exc_info:
+        compile_workflow(workflow)
+    return exc_info.value.errors
+
+def test_dangling_edge_is_rejected():
+    workflow = {
+        "nodes": [{"id": "in", "type": "inputNode", "data": {}}],
+        "edges": [{"source": "in", "target": "ghost", "targetHandle": "input"}],
+    }
+
+    assert errors_of(workflow) == ["Edge in -> ghost references a node that does not exist"]
+
+def test_unknown_types_and_handles_are_rejected():
+    workflow = {
+        "nodes": [
+            {"id": "in", "type": "inputNode", "data": {}},
+            {"id": "llm", "type": "llmNode", "data": {}},
+            {"id": "odd", "type": "searchNode", "data": {}},
+        ],
+        "edges": [{"source": "in", "target": "llm", "sourceHandle": "answer", "targetHandle": "question"}],
+    }
+
+    assert errors_of(workflow) == [
+        "Node 'odd' has unknown type 'searchNode'",
+        "Edge in -> llm uses unknown output handle 'answer' of inputNode",
+        "Edge in -> llm uses unknown input handle 'question' of llmNode",
+    ]
+
+def test_cycle_is_rejected():
+    workflow = {
+        "nodes": [{"id": "a", "type": "llmNode", "data": {}}, {"id": "b", "type": "llmNode", "data": {}}],
+        "edges": [
+            {"source": "a", "target": "b", "targetHandle": "prompt"},
+            {"source": "b", "target": "a", "targetHandle": "prompt"},
+        ],
+    }
+
+    assert errors_of(workflow) == ["Cycle detected in workflow"]
+
+def prompt_workflow(template):
+    return {
+        "nodes": [
+            {"id": "in", "type": "inputNode", "data": {}},
+            {"id": "p", "type": "promptNode", "data": {"template": template}},
+        ],
+        "edges": [{"source": "in", "target": "p", "targetHandle": "topic"}],
+    }
+
+def test_template_variables_need_a_connected_edge():
+    compile_workflow(prompt_workflow("Tell me about {topic}"))
+
+    assert errors_of(prompt_workflow("Compare {topic} with {other}")) == [
+        "Prompt node 'p' uses {other} but nothing is connected to it"
+    ]
+
+@pytest.mark.parametrize("template", ["Broken {topic", "JSON: {}", "{0}"])
+def test_invalid_template_syntax_is_rejected(template):
+    [error] = errors_of(prompt_workflow(template))
+
+    assert error.startswith("Prompt node 'p' has an invalid template")
+
+def test_run_rejects_invalid_workflow_before_any_node_runs(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import engine
+    from app.main import app
+
+    executed = []
+
+    async def execute_node(node, inputs, template=None):
+        executed.append(node["id"])
+        return {"output": ""}
+
+    monkeypatch.setattr(engine, "execute_node", execute_node)
+    client = TestClient(app)
+    workflow = {
+        "nodes": [
+            {"id": "in", "type": "inputNode", "data": {}},
+            {"id": "p", "type": "promptNode", "data": {"template": "About {missing}"}},
+        ],
+        "edges": [],
+    }
+
+    saved = client.post("/api/workflows/", json={"name": "broken", "data": workflow}).json()
+    assert saved["validation_errors"] == ["Prompt node 'p' uses {missing} but nothing is connected to it"]
+
+    response = client.post(f"/api/run/{saved['id']}", json={"inputs": {}})
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["errors"] == saved["validation_errors"]
+    assert executed == []
@@ -0,0 +1,177 @@
+import time
+import asyncio
+import hashlib
+
+import pytest
+
+from app import engine
+from app.nodes.llm import llm_router
+from app.nodes.llm_router import ProviderError
+
+class FakeLLM:
+    """
+    Stands in for a provider: sleeps `delay`, tracks peak concurrency, and fails
+    for prompts containing `fail_on`. Replies are distinct per prompt so
+    single-flight never coalesces two different calls.
+    """
+
+    def __init__(self, delay: float = 0.0, fail_on: str = None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, prompt: str, model: str):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            delay = self.delay(prompt) if callable(self.delay) else self.delay
+            await asyncio.sleep(delay)
+        finally:
+            self.active -= 1
+        if self.fail_on and self.fail_on in prompt:
+            raise ProviderError("Error: provider down")
+        if prompt.startswith("item-"):
+            return {"output": f"done {prompt}"}
+        return {"output": "summary " + hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]}
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    provider = FakeLLM()
+    monkeypatch.setattr(llm_router, "providers", [("fake", provider)])
+    monkeypatch.setattr(llm_router, "breakers", {})
+    monkeypatch.setattr(llm_router, "latencies", {})
+    return provider
+
+def llm_node(node_id, **data):
+    return {"id": node_id, "type": "llmNode", "data": {"model": "fake-model", **data}}
+
+def edge(source, target, target_handle, source_handle=None):
+    return {"source": source, "target": target, "sourceHandle": source_handle, "targetHandle": target_handle}
+
+def test_resolve_handle_falls_back_to_output():
+    outputs = {"output": "text", "context": "chunks"}
+
+    assert engine.resolve_handle(outputs, "context") == "chunks"
+    assert engine.resolve_handle(outputs, "missing") == "text"
+    assert engine.resolve_handle(outputs, None) == "text"
+    assert engine.resolve_handle("plain", "context") == "plain"
+
+def test_edges_route_by_source_handle():
+    workflow = {
+        "nodes": [
+            {"id": "in", "type": "inputNode", "data": {}},
+            {"id": "map", "type": "mapNode", "data": {}},
+            {"id": "count", "type": "outputNode", "data": {}},
+            {"id": "all", "type": "outputNode", "data": {}},
+        ],
+        "edges": [
+            edge("in", "map", "items"),
+            edge("map", "count", "input", "count"),
+            edge("map", "all", "input"),
+        ],
+    }
+
+    outputs = asyncio.run(engine.run_workflow(workflow, {"input": ["a", "b", "c"]}))
+
+    assert outputs["count"] == {"output": 3}
+    assert outputs["all"] == {"output": ["a", "b", "c"]}
+
+def test_independent_branches_run_concurrently(fake_llm):
+    fake_llm.delay = 0.2
+    workflow = {
+        "nodes": [
+            {"id": "in", "type": "inputNode", "data": {}},
+            llm_node("a", prompt="first"),
+            llm_node("b", prompt="second"),
+            {"id": "out_a", "type": "outputNode", "data": {}},
+            {"id": "out_b", "type": "outputNode", "data": {}},
+        ],
+        "edges": [
+            edge("in", "a", "prompt"),
+            edge("in", "b", "prompt"),
+            edge("a", "out_a", "input"),
+            edge("b", "out_b", "input"),
+        ],
+    }
+
+    start = time.perf_counter()
+    outputs = asyncio.run(engine.run_workflow(workflow, {"input": "topic"}))
+    elapsed = time.perf_counter() - start
+
+    assert set(outputs) == {"out_a", "out_b"}
+    assert fake_llm.peak == 2
+    assert elapsed < 0.35
+
+def test_map_caps_concurrency_and_keeps_input_order(fake_llm):
+    # Later items finish first
+    fake_llm.delay = lambda prompt: 0.05 / int(prompt.split("-")[1])
+    items = [f"item-{i}" for i in range(1, 11)]
+
+    result = asyncio.run(engine.execute_map_node(items, {"node": llm_node("sub"), "concurrency": 3}))
+
+    assert fake_llm.peak == 3
+    assert result["output"] == [f"done {item}" for item in items]
+    assert result["count"] == 10
+
+def test_reduce_flattens_fan_in_lists():
+    node = {"id": "r", "type": "reduceNode", "data": {"separator": ","}}
+
+    result = asyncio.run(engine.execute_node(node, {"items": [["a", "b"], "c", ["d"]]}))
+
+    assert result == {"output": "a,b,c,d"}
+
+def test_map_reduce_uses_log_depth_llm_rounds(fake_llm):
+    fake_llm.delay = 0.05
+    workflow = {
+        "nodes": [
+            {"id": "in", "type": "inputNode", "data": {}},
+            {"id": "map", "type": "mapNode", "data": {"node": llm_node("sub"), "concurrency": 64}},
+            {"id": "reduce", "type": "reduceNode", "data": {"model": "fake-model", "fanIn": 4, "concurrency": 64}},
+            {"id": "out", "type": "outputNode", "data": {}},
+        ],
+        "edges": [
+            edge("in", "map", "items"),
+            edge("map", "reduce", "items"),
+            edge("reduce", "out", "input"),
+        ],
+    }
+    items = [f"item-{i}" for i in range(64)]
+
+    start = time.perf_counter()
+    outputs = asyncio.run(engine.run_workflow(workflow, {"input": items}))
+    elapsed = time.perf_counter() - start
+
+    # 64 map calls, then 16 + 4 + 1 reduce calls in three rounds
+    assert fake_llm.calls == 64 + 16 + 4 + 1
+    assert outputs["out"]["output"].startswith("summary ")
+    # One map round plus three reduce rounds, not one round per item
+    assert elapsed < 0.6
+
+def test_reduce_stops_at_failed_level(fake_llm):
+    fake_llm.fail_on = "part-c"
+    data = {"model": "fake-model", "fanIn": 2}
+
+    result = asyncio.run(engine.execute_reduce_node(["part-a", "part-b", "part-c"], data))
+
+    assert result == {"output": "Error: Reduce failed: Error: provider down"}
+    assert fake_llm.calls == 2
+
+@pytest.mark.parametrize("file_name", ["../sql_app.db", "/etc/passwd", ".."])
+def test_map_rejects_file_paths(file_name):
+    node = {"id": "m", "type": "mapNode", "data": {"fileName": file_name}}
+
+    result = asyncio.run(engine.execute_node(node, {}))
+
+    assert result == {"output": f"Error: Invalid file name '{file_name}'."}
+
+def test_map_reports_unreadable_file():
+    with open("uploads/table.csv", "w") as f:
+        f.write("a,b\n1,2\n")
+    node = {"id": "m", "type": "mapNode", "data": {"fileName": "table.csv"}}
+
+    result = asyncio.run(engine.execute_node(node, {}))
+
+    assert result["output"].startswith("Error: Could not read 'table.csv'")
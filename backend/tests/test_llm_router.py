@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+
+from app.nodes.llm_router import LLMRouter, ProviderError
+
+ROUTES = {
+    "fast-primary": {"slo_ms": 20, "fallback": "fast-fallback"},
+    "slow-primary": {"slo_ms": 20, "fallback": "fast-fallback"},
+    "bad-primary": {"slo_ms": 20, "fallback": "fast-fallback"},
+    "flaky": {"slo_ms": 20},
+    "fast-fallback": {"slo_ms": 20},
+}
+
+class ManualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class FakeProvider:
+    """
+    Records calls; sleeps `delay` seconds, then fails while `fail` is set.
+    """
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, prompt: str, model: str):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ProviderError(f"Error from {model}")
+        return {"output": f"{model}: {prompt}"}
+
+def make_router(clock=None, **providers):
+    # Model names are "<prefix>-..." so substring matching picks the fake
+    return LLMRouter(
+        providers=[(prefix, provider) for prefix, provider in providers.items()],
+        routes=ROUTES,
+        clock=clock or ManualClock(),
+        failure_threshold=2,
+        cooldown=10,
+    )
+
+def test_primary_within_slo_is_not_hedged():
+    primary, fallback = FakeProvider(), FakeProvider()
+    router = make_router(**{"fast-p": primary, "fast-f": fallback})
+
+    result = asyncio.run(router.generate("hi", "fast-primary"))
+
+    assert result == {"output": "fast-primary: hi"}
+    assert fallback.calls == 0
+
+def test_slow_primary_is_hedged_and_loser_cancelled():
+    primary, fallback = FakeProvider(delay=5), FakeProvider()
+    router = make_router(slow=primary, fast=fallback)
+
+    result = asyncio.run(router.generate("hi", "slow-primary"))
+
+    assert result == {"output": "fast-fallback: hi"}
+    assert primary.calls == 1 and fallback.calls == 1
+    # Losing a hedge race is not a provider failure
+    assert primary.cancelled == 1
+    assert router.breaker("slow-primary").failures == 0
+    assert router.breaker("slow-primary").state == "closed"
+
+def test_failing_primary_fails_over():
+    primary, fallback = FakeProvider(fail=True), FakeProvider()
+    router = make_router(bad=primary, fast=fallback)
+
+    result = asyncio.run(router.generate("hi", "bad-primary"))
+
+    assert result == {"output": "fast-fallback: hi"}
+    assert router.breaker("bad-primary").failures == 1
+
+def test_failover_reports_primary_error_when_both_fail():
+    router = make_router(bad=FakeProvider(fail=True), fast=FakeProvider(fail=True))
+
+    with pytest.raises(ProviderError, match="bad-primary"):
+        asyncio.run(router.generate("hi", "bad-primary"))
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = ManualClock()
+    provider = FakeProvider(fail=True)
+    router = make_router(clock=clock, flaky=provider)
+
+    for _ in range(2):
+        with pytest.raises(ProviderError, match="Error from flaky"):
+            asyncio.run(router.generate("hi", "flaky"))
+    assert router.breaker("flaky").state == "open"
+
+    # Open: rejected without reaching the provider
+    with pytest.raises(ProviderError, match="temporarily unavailable"):
+        asyncio.run(router.generate("hi", "flaky"))
+    assert provider.calls == 2
+
+    # Half-open: a failed probe re-opens the circuit
+    clock.now = 10
+    assert router.breaker("flaky").state == "half_open"
+    with pytest.raises(ProviderError, match="Error from flaky"):
+        asyncio.run(router.generate("hi", "flaky"))
+    assert provider.calls == 3
+    assert router.breaker("flaky").state == "open"
+
+    # Half-open again: a successful probe closes it
+    clock.now = 20
+    provider.fail = False
+    assert asyncio.run(router.generate("hi", "flaky")) == {"output": "flaky: hi"}
+    assert router.breaker("flaky").state == "closed"
+
+def test_open_breaker_routes_to_fallback():
+    clock = ManualClock()
+    primary, fallback = FakeProvider(fail=True), FakeProvider()
+    router = make_router(clock=clock, bad=primary, fast=fallback)
+
+    for _ in range(2):
+        asyncio.run(router.generate("hi", "bad-primary"))
+    assert router.breaker("bad-primary").state == "open"
+
+    assert asyncio.run(router.generate("hi", "bad-primary")) == {"output": "fast-fallback: hi"}
+    assert primary.calls == 2
+
+def test_unknown_models_share_one_bucket_per_provider():
+    router = make_router(fast=FakeProvider(), slow=FakeProvider())
+
+    asyncio.run(router.generate("hi", "fast-custom-1"))
+    asyncio.run(router.generate("hi", "fast-custom-2"))
+    asyncio.run(router.generate("hi", "slow-custom"))
+
+    assert set(router.breakers) == {"other:fast", "other:slow"}
+    assert set(router.latencies) == {"other:fast", "other:slow"}
+
+def test_failing_unknown_model_does_not_block_other_providers():
+    router = make_router(bad=FakeProvider(fail=True), fast=FakeProvider())
+
+    for _ in range(3):
+        with pytest.raises(ProviderError):
+            asyncio.run(router.generate("hi", "bad-typo"))
+    assert router.breaker("bad-typo").state == "open"
+
+    assert asyncio.run(router.generate("hi", "fast-custom")) == {"output": "fast-custom: hi"}
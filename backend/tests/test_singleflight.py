@@ -0,0 +1,118 @@
+import time
+import asyncio
+
+from app.nodes import rag
+from app.nodes.singleflight import SingleFlight, make_key
+from app.nodes.llm import execute_llm_node
+
+class Upstream:
+    def __init__(self, delay: float = 0.05, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.finished = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        self.finished += 1
+        if self.error:
+            raise self.error
+        return {"output": "done"}
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        key = make_key("llm", "gpt-4", "hi")
+        return upstream, await asyncio.gather(*(flight.do(key, upstream) for _ in range(10)))
+
+    upstream, results = asyncio.run(main())
+    assert upstream.calls == 1
+    assert results == [{"output": "done"}] * 10
+
+def test_every_caller_gets_the_same_exception():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream(error=RuntimeError("boom"))
+        return await asyncio.gather(*(flight.do("k", upstream) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(main())
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert errors[0] is errors[1] is errors[2]
+
+def test_cancelled_caller_does_not_cancel_shared_task():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream(delay=0.1)
+        leaving = asyncio.ensure_future(flight.do("k", upstream))
+        staying = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        result = await staying
+        return upstream, leaving, result
+
+    upstream, leaving, result = asyncio.run(main())
+    assert leaving.cancelled()
+    assert result == {"output": "done"}
+    assert upstream.calls == 1 and upstream.finished == 1
+
+def test_key_is_released_when_the_call_finishes():
+    async def main():
+        flight, upstream = SingleFlight(), Upstream()
+        await flight.do("k", upstream)
+        await asyncio.sleep(0)  # let the done callback run
+        in_flight = flight.in_flight()
+        await flight.do("k", upstream)
+        return upstream, in_flight
+
+    upstream, in_flight = asyncio.run(main())
+    assert in_flight == 0
+    assert upstream.calls == 2
+
+def test_null_model_returns_error_output():
+    result = asyncio.run(execute_llm_node("hi", None))
+    assert result["output"].startswith("Error generating response")
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+
+    def count(self):
+        return len(self.documents)
+
+    def add(self, documents, ids):
+        self.documents.extend(documents)
+
+    def query(self, query_texts, n_results):
+        return {"documents": [self.documents[:n_results]]}
+
+class FakeChromaClient:
+    def __init__(self):
+        self.collection = FakeCollection()
+
+    def get_or_create_collection(self, name, embedding_function):
+        return self.collection
+
+def test_concurrent_cold_rag_calls_index_once(monkeypatch):
+    client = FakeChromaClient()
+    ingestions = []
+
+    def slow_index(collection, file_path, file_name):
+        # Same contract as rag._index_document: no-op once the collection has data
+        if collection.count() > 0:
+            return
+        ingestions.append(file_name)
+        time.sleep(0.2)
+        collection.add(documents=["chunk"], ids=["id0"])
+
+    monkeypatch.setattr(rag, "chroma_client", client)
+    monkeypatch.setattr(rag.embedding_functions, "OpenAIEmbeddingFunction", lambda **kwargs: None)
+    monkeypatch.setattr(rag, "_index_document", slow_index)
+    with open("uploads/cold.pdf", "w") as f:
+        f.write("placeholder")
+
+    async def main():
+        # Distinct queries, so only the per-collection ingestion is shared
+        return await asyncio.gather(*(rag.execute_rag_node(f"question {i}", "cold.pdf") for i in range(5)))
+
+    results = asyncio.run(main())
+    assert ingestions == ["cold.pdf"]
+    assert all(result == {"output": "chunk"} for result in results)